@@ -2,15 +2,22 @@
 
 import os
 import asyncio
+import functools
 import uuid
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple, Union
+import anyio
 from fastapi import FastAPI, HTTPException, BackgroundTasks
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from langgraph.graph import StateGraph, END
-from qdrant_client import QdrantClient
-from qdrant_client.models import PointStruct, VectorParams, Distance, Filter, FieldCondition, MatchValue
+from qdrant_client import AsyncQdrantClient
+from qdrant_client.models import PointStruct, VectorParams, Distance, Filter, FieldCondition, MatchValue, QueryRequest
+from qdrant_client.models import ScalarQuantization, ScalarQuantizationConfig, ScalarType, ScoredPoint, HnswConfigDiff
 import numpy as np
+import orjson
+from numba import njit
 import time
 import random
 import json
@@ -18,10 +25,29 @@ import logging
 
 global_app = FastAPI(title="Messy LangGraph + Qdrant API", version="0.1")
 global_qdrant_client = None
+global_qdrant_in_memory = False
 global_workflow = None
 global_embedding_dim = 384  # Using all-MiniLM-L6-v2 dimension
 global_collection_name = "messy_documents"
-global_state_store = {}  # Simulating persistent state poorly
+global_state_store = set()  # Ids of ingested points - Qdrant holds the payloads
+global_search_queue = None  # Pending (query_vector, filter_key, future) entries for the search batcher
+global_search_batcher_task = None
+global_search_batch_size = 32
+global_search_batch_wait = 0.05  # Seconds to wait for more queries before firing a batch
+global_search_timeout = 30.0  # Seconds a query waits for its batch before giving up
+global_search_inflight = set()  # Dispatched batch query tasks, referenced until they finish
+global_scroll_page_size = 256  # Points fetched per scroll call when listing documents
+global_cache_capacity = 4096
+global_cache_threshold = 0.97  # Cosine similarity needed to reuse a cached result
+global_cache_vecs = np.zeros((global_cache_capacity, global_embedding_dim), dtype=np.float32)
+global_cache_last_used = np.zeros(global_cache_capacity, dtype=np.int64)
+global_cache_docs = []  # retrieved_docs for each filled row of global_cache_vecs
+global_cache_clock = 0
+global_cache_generation = 0  # Bumped on every write so in-flight searches can't cache stale results
+global_mem_vecs = np.empty((0, global_embedding_dim), dtype=np.float32)  # Mirror of vectors for :memory: mode
+global_mem_ids = []  # Point id for each filled row of global_mem_vecs
+global_mem_rows = {}  # Point id -> row in global_mem_vecs
+global_mem_scans = 0  # memory_scores calls currently reading global_mem_vecs from a worker thread
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger("messy_app")
@@ -33,6 +59,7 @@ class DocumentInput(BaseModel):
 class QueryInput(BaseModel):
     query: str
     top_k: int = 5
+    metadata_filter: Optional[Dict[str, Union[str, int, bool]]] = None  # Exact match on metadata fields
 
 class WorkflowResult(BaseModel):
     initial_query: str
@@ -41,55 +68,299 @@ class WorkflowResult(BaseModel):
     processing_time: float
 
 # Embedding function 
-def generate_embedding(text: str) -> List[float]:
-    # In real life, you'd use a proper model like sentence-transformers
-    # Here we fake it with random numbers seeded by text length for "determinism"
-    random.seed(hash(text) % (10 ** 9))
-    return [random.random() for _ in range(global_embedding_dim)]
+# In real life, you'd use a proper model like sentence-transformers.
+# Here we fake it with a splitmix64 hash of (text hash, dimension) for "determinism":
+# each element depends only on its own text, so a single text and a whole batch
+# go through the same handful of NumPy ops and give identical rows
+_splitmix_offsets = np.arange(1, global_embedding_dim + 1, dtype=np.uint64) * np.uint64(0x9E3779B97F4A7C15)
+
+def _embed_seeds(seeds: np.ndarray) -> np.ndarray:
+    z = seeds[:, np.newaxis] + _splitmix_offsets
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    z ^= z >> np.uint64(31)
+    # Top 24 bits -> float32 in [0, 1)
+    embeddings = (z >> np.uint64(40)).astype(np.float32) * np.float32(2.0 ** -24)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True) + 1e-12  # Unit length so dot product == cosine
+    return embeddings
+
+def _text_seed(text: str) -> int:
+    return hash(text) & 0xFFFFFFFFFFFFFFFF
+
+def _generate_embedding_uncached(text: str) -> np.ndarray:
+    embedding = _embed_seeds(np.array([_text_seed(text)], dtype=np.uint64))[0]
+    embedding.setflags(write=False)  # Shared between callers via the cache below
+    return embedding
+
+# Query path only - the cache keys on the full text, so caching ingested
+# documents would pin up to maxsize complete bodies in memory
+generate_embedding = functools.lru_cache(maxsize=65536)(_generate_embedding_uncached)
+
+def generate_embeddings(texts: List[str]) -> np.ndarray:
+    # One (N, dim) kernel call - rows match generate_embedding() for the same
+    # string, so documents can still be found by their own content
+    seeds = np.fromiter((_text_seed(text) for text in texts), dtype=np.uint64, count=len(texts))
+    return _embed_seeds(seeds)
+
+# Point construction for upserts
+def make_point(point_id: str, vector: List[float], payload: Dict[str, Any]) -> PointStruct:
+    # Ids, vectors and payloads are built by this module, so skip pydantic validation
+    return PointStruct.model_construct(id=point_id, vector=vector, payload=payload)
 
 # Qdrant setup function
-def setup_qdrant():
-    global global_qdrant_client
+async def setup_qdrant():
+    global global_qdrant_client, global_qdrant_in_memory
     if global_qdrant_client is None:
         # Try to connect to Qdrant - assume it's running locally
         try:
-            global_qdrant_client = QdrantClient(host="localhost", port=6334)
+            global_qdrant_client = AsyncQdrantClient(host="localhost", grpc_port=6334, prefer_grpc=True)
+            # The constructor never touches the network - probe so the fallback can trigger
+            await global_qdrant_client.get_collections()
             logger.info("Connected to Qdrant")
         except Exception as e:
             logger.error(f"Failed to connect to Qdrant: {e}")
-            global_qdrant_client = QdrantClient(":memory:")
+            global_qdrant_client = AsyncQdrantClient(":memory:")
+            global_qdrant_in_memory = True
             logger.info("Using in-memory Qdrant (probably won't work well)")
 
     # Create collection if it doesn't exist
     try:
-        global_qdrant_client.get_collection(global_collection_name)
+        await global_qdrant_client.get_collection(global_collection_name)
     except Exception:
-        global_qdrant_client.create_collection(
+        await global_qdrant_client.create_collection(
             collection_name=global_collection_name,
-            vectors_config=VectorParams(size=global_embedding_dim, distance=Distance.COSINE)
+            # Keep vectors and the HNSW graph in RAM rather than mmap'd from disk
+            vectors_config=VectorParams(size=global_embedding_dim, distance=Distance.DOT, on_disk=False),
+            hnsw_config=HnswConfigDiff(on_disk=False),
+            # int8 copies of the vectors stay in RAM for scoring - 4x smaller than float32
+            quantization_config=ScalarQuantization(
+                scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, always_ram=True)
+            )
         )
         logger.info(f"Created collection {global_collection_name}")
 
-# State dictionary for LangGraph
-def create_initial_state(query: str) -> Dict[str, Any]:
-    return {
-        "query": query,
-        "retrieved_docs": [],
-        "final_answer": "",
-        "processing_steps": [],
-        "error": None
-    }
+# Search batching - coalesce concurrent queries into one query_batch_points call
+FilterKey = Optional[Tuple[Tuple[str, str, Union[str, int, bool]], ...]]
 
-# LangGraph node functions
-def retrieve_documents_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    query = state["query"]
+def make_filter_key(metadata_filter: Optional[Dict[str, Any]]) -> FilterKey:
+    if not metadata_filter:
+        return None
+    # The type name keeps True and 1 from sharing a compiled filter
+    return tuple(sorted((name, type(value).__name__, value) for name, value in metadata_filter.items()))
+
+# Compiled filters are never mutated, so recently used ones are reused across windows
+@functools.lru_cache(maxsize=1024)
+def compile_filter(filter_key: FilterKey) -> Optional[Filter]:
+    if filter_key is None:
+        return None
+    return Filter(must=[
+        FieldCondition(key=f"metadata.{name}", match=MatchValue(value=value))
+        for name, _, value in filter_key
+    ])
+
+async def run_search_group(filter_key: FilterKey, group: List[Tuple[np.ndarray, FilterKey, asyncio.Future]]):
     try:
-        query_vector = generate_embedding(query)
-        search_result = global_qdrant_client.search(
+        query_filter = compile_filter(filter_key)
+        requests = [
+            QueryRequest(query=query_vector.tolist(), filter=query_filter, limit=5, with_payload=True)
+            for query_vector, _, _ in group
+        ]
+        batch_responses = await global_qdrant_client.query_batch_points(
             collection_name=global_collection_name,
-            query_vector=query_vector,
-            limit=5
+            requests=requests
         )
+    except Exception as e:
+        for _, _, future in group:
+            if not future.done():
+                future.set_exception(e)
+        return
+
+    for (_, _, future), response in zip(group, batch_responses):
+        if not future.done():  # Caller may have gone away
+            future.set_result(response.points)
+
+async def search_batcher():
+    loop = asyncio.get_running_loop()
+    while True:
+        pending = [await global_search_queue.get()]
+        try:
+            # Take whatever is already queued without waiting
+            while len(pending) < global_search_batch_size and not global_search_queue.empty():
+                pending.append(global_search_queue.get_nowait())
+
+            # Only hold the window open under load - with nothing in flight, a lone
+            # query would just pay the wait for no batching gain
+            if global_search_inflight:
+                deadline = loop.time() + global_search_batch_wait
+                while len(pending) < global_search_batch_size:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        pending.append(await asyncio.wait_for(global_search_queue.get(), timeout=timeout))
+                    except asyncio.TimeoutError:
+                        break
+
+            # Qdrant only shares work across a batch when the filter is the same,
+            # so send one batch request per distinct filter. Groups are dispatched as
+            # tasks so the next window can fill while this one is on the wire
+            groups = {}
+            for entry in pending:
+                groups.setdefault(entry[1], []).append(entry)
+            for filter_key, group in groups.items():
+                task = asyncio.create_task(run_search_group(filter_key, group))
+                global_search_inflight.add(task)
+                task.add_done_callback(global_search_inflight.discard)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # Never let one bad window kill the batcher and strand later queries
+            logger.error(f"Search batcher failed: {e}")
+            for _, _, future in pending:
+                if not future.done():
+                    future.set_exception(e)
+
+async def batched_search(query_vector: np.ndarray, filter_key: FilterKey = None):
+    future = asyncio.get_running_loop().create_future()
+    await global_search_queue.put((query_vector, filter_key, future))
+    return await asyncio.wait_for(future, timeout=global_search_timeout)
+
+# Semantic cache - reuse retrieved_docs for near-identical query vectors
+def semantic_cache_lookup(query_vector: np.ndarray) -> Optional[List[Dict[str, Any]]]:
+    global global_cache_clock
+    filled = len(global_cache_docs)
+    if filled == 0:
+        return None
+    sims = global_cache_vecs[:filled] @ query_vector
+    best = int(np.argmax(sims))
+    if sims[best] < global_cache_threshold:
+        return None
+    global_cache_clock += 1
+    global_cache_last_used[best] = global_cache_clock
+    return global_cache_docs[best]
+
+def semantic_cache_store(query_vector: np.ndarray, docs: List[Dict[str, Any]]):
+    global global_cache_clock
+    filled = len(global_cache_docs)
+    if filled < global_cache_capacity:
+        row = filled
+        global_cache_docs.append(docs)
+    else:
+        row = int(np.argmin(global_cache_last_used))  # Evict least recently used
+        global_cache_docs[row] = docs
+    global_cache_vecs[row] = query_vector
+    global_cache_clock += 1
+    global_cache_last_used[row] = global_cache_clock
+
+def semantic_cache_clear():
+    # Cached results go stale as soon as the collection changes
+    global global_cache_generation
+    global_cache_generation += 1
+    global_cache_docs.clear()
+
+# In-memory search - the local Qdrant client scores points one by one in Python,
+# so in :memory: mode we keep a contiguous float32 matrix and search it ourselves
+# Serial on purpose: it is always called from worker threads, and parallel
+# kernels launched off the main thread can hang the TBB layer at exit.
+# nogil lets concurrent queries scan side by side in the thread pool instead
+@njit(fastmath=True, cache=True, nogil=True)
+def memory_scores(mat: np.ndarray, query_vector: np.ndarray) -> np.ndarray:
+    scores = np.empty(mat.shape[0], dtype=np.float32)
+    for i in range(mat.shape[0]):
+        acc = np.float32(0.0)
+        for j in range(mat.shape[1]):
+            acc += mat[i, j] * query_vector[j]
+        scores[i] = acc
+    return scores
+
+def memory_index_add(point_ids: List[str], vectors: np.ndarray):
+    global global_mem_vecs
+    filled = len(global_mem_ids)
+    needed = filled + len(point_ids)
+    if needed > global_mem_vecs.shape[0]:
+        grown = np.empty((max(needed, 2 * global_mem_vecs.shape[0], 1024), global_embedding_dim), dtype=np.float32)
+        grown[:filled] = global_mem_vecs[:filled]
+        global_mem_vecs = grown
+    global_mem_vecs[filled:needed] = vectors
+    for row, point_id in enumerate(point_ids, start=filled):
+        global_mem_rows[point_id] = row
+    global_mem_ids.extend(point_ids)
+
+def memory_index_remove(point_id: str):
+    global global_mem_vecs
+    row = global_mem_rows.pop(point_id, None)
+    if row is None:
+        return
+    # Move the last row into the hole so the matrix stays dense. A scan running
+    # in a worker thread may still be reading the old rows, so copy in that case
+    last = len(global_mem_ids) - 1
+    last_id = global_mem_ids.pop()
+    if row != last:
+        if global_mem_scans:
+            global_mem_vecs = global_mem_vecs.copy()
+        global_mem_vecs[row] = global_mem_vecs[last]
+        global_mem_ids[row] = last_id
+        global_mem_rows[last_id] = row
+
+async def memory_search(query_vector: np.ndarray, limit: int = 5) -> List[ScoredPoint]:
+    global global_mem_scans
+    point_ids = list(global_mem_ids)
+    if not point_ids:
+        return []
+    # Scan in a worker thread so other requests keep running on the event loop
+    global_mem_scans += 1
+    try:
+        scores = await anyio.to_thread.run_sync(memory_scores, global_mem_vecs[:len(point_ids)], query_vector)
+    finally:
+        global_mem_scans -= 1
+    limit = min(limit, len(point_ids))
+    top = np.argpartition(-scores, limit - 1)[:limit]
+    top = top[np.argsort(-scores[top])]
+    # Payloads still come from Qdrant, which stays the source of truth
+    records = await global_qdrant_client.retrieve(
+        collection_name=global_collection_name,
+        ids=[point_ids[i] for i in top],
+        with_payload=True
+    )
+    payloads = {str(record.id): record.payload for record in records}
+    # Points deleted while the scan ran are gone from Qdrant - drop them
+    return [
+        ScoredPoint(id=point_ids[i], version=0, score=float(scores[i]), payload=payloads[point_ids[i]])
+        for i in top
+        if point_ids[i] in payloads
+    ]
+
+# State schema for LangGraph
+@dataclass(slots=True)
+class WorkflowState:
+    query: str
+    retrieved_docs: List[Dict[str, Any]] = field(default_factory=list)
+    final_answer: str = ""
+    processing_steps: List[str] = field(default_factory=list)
+    error: Optional[str] = None
+    metadata_filter: Optional[Dict[str, Any]] = None
+
+def create_initial_state(query: str, metadata_filter: Optional[Dict[str, Any]] = None) -> WorkflowState:
+    return WorkflowState(query=query, metadata_filter=metadata_filter)
+
+# LangGraph node functions
+async def retrieve_documents_node(state: WorkflowState) -> WorkflowState:
+    query = state.query
+    try:
+        query_vector = generate_embedding(query)
+        filter_key = make_filter_key(state.metadata_filter)
+        cache_generation = global_cache_generation
+        if filter_key is None:  # The cache and the in-memory scan only cover unfiltered search
+            cached_docs = semantic_cache_lookup(query_vector)
+            if cached_docs is not None:
+                state.retrieved_docs = cached_docs
+                state.processing_steps.append("Retrieved documents from semantic cache")
+                return state
+
+        if global_qdrant_in_memory and filter_key is None:
+            search_result = await memory_search(query_vector)
+        else:
+            search_result = await batched_search(query_vector, filter_key)
         docs = []
         for hit in search_result:
             docs.append({
@@ -98,46 +369,49 @@ def retrieve_documents_node(state: Dict[str, Any]) -> Dict[str, Any]:
                 "metadata": hit.payload.get("metadata", {}),
                 "score": hit.score
             })
-        state["retrieved_docs"] = docs
-        state["processing_steps"].append("Retrieved documents from Qdrant")
+        # Skip storing if a write landed while we searched - docs may predate it
+        if filter_key is None and cache_generation == global_cache_generation:
+            semantic_cache_store(query_vector, docs)
+        state.retrieved_docs = docs
+        state.processing_steps.append("Retrieved documents from Qdrant")
     except Exception as e:
-        state["error"] = f"Retrieval failed: {str(e)}"
-        logger.error(state["error"])
+        state.error = f"Retrieval failed: {str(e)}"
+        logger.error(state.error)
     return state
 
-def generate_answer_node(state: Dict[str, Any]) -> Dict[str, Any]:
-    if state["error"]:
-        state["final_answer"] = f"Error occurred: {state['error']}"
+async def generate_answer_node(state: WorkflowState) -> WorkflowState:
+    if state.error:
+        state.final_answer = f"Error occurred: {state.error}"
         return state
     
-    docs = state["retrieved_docs"]
+    docs = state.retrieved_docs
     if not docs:
-        state["final_answer"] = "No relevant documents found."
+        state.final_answer = "No relevant documents found."
         return state
     
     # Super naive answer generation
     top_doc = docs[0]["content"]
-    state["final_answer"] = f"Based on the document: {top_doc[:200]}..."  # Truncate for sanity
-    state["processing_steps"].append("Generated final answer")
+    state.final_answer = f"Based on the document: {top_doc[:200]}..."  # Truncate for sanity
+    state.processing_steps.append("Generated final answer")
     return state
 
-def should_retry_node(state: Dict[str, Any]) -> str:
-    return "generate_answer"
+# Retrieval and answer generation always run back to back, so they share one
+# node and LangGraph reconciles state once per query instead of twice
+async def rag_node(state: WorkflowState) -> WorkflowState:
+    return await generate_answer_node(await retrieve_documents_node(state))
 
 def build_workflow():
     global global_workflow
-    workflow = StateGraph(dict)  
+    workflow = StateGraph(WorkflowState)  
     
     # Add nodes (procedures)
-    workflow.add_node("retrieve", retrieve_documents_node)
-    workflow.add_node("generate_answer", generate_answer_node)
+    workflow.add_node("rag", rag_node)
     
     # Set entry point
-    workflow.set_entry_point("retrieve")
+    workflow.set_entry_point("rag")
     
     # Add edges
-    workflow.add_edge("retrieve", "generate_answer")
-    workflow.add_edge("generate_answer", END)
+    workflow.add_edge("rag", END)
     
     # Compile - this is the runnable workflow
     global_workflow = workflow.compile()
@@ -145,16 +419,35 @@ def build_workflow():
 # FastAPI startup event - set up everything here
 @global_app.on_event("startup")
 async def startup_event():
-    setup_qdrant()
+    global global_search_queue, global_search_batcher_task
+    await setup_qdrant()
     build_workflow()
+    # Throwaway search so the first real query doesn't pay for loading the index
+    try:
+        await global_qdrant_client.query_points(
+            collection_name=global_collection_name,
+            query=[0.0] * global_embedding_dim,
+            limit=1
+        )
+    except Exception as e:
+        logger.warning(f"Qdrant warm-up search failed: {e}")
+    global_search_queue = asyncio.Queue()
+    global_search_batcher_task = asyncio.create_task(search_batcher())
     logger.info("Messy application started!")
 
+@global_app.on_event("shutdown")
+async def shutdown_event():
+    if global_search_batcher_task is not None:
+        global_search_batcher_task.cancel()
+    for task in list(global_search_inflight):
+        task.cancel()
+
 # FastAPI routes 
 @global_app.post("/ingest")
 async def ingest_document(doc: DocumentInput, background_tasks: BackgroundTasks):
     try:
         # Generate embedding
-        embedding = generate_embedding(doc.content)
+        embedding = _generate_embedding_uncached(doc.content)
         
         # Create point ID
         point_id = str(uuid.uuid4())
@@ -167,12 +460,15 @@ async def ingest_document(doc: DocumentInput, background_tasks: BackgroundTasks)
         }
         
         # Upsert to Qdrant
-        global_qdrant_client.upsert(
+        await global_qdrant_client.upsert(
             collection_name=global_collection_name,
-            points=[PointStruct(id=point_id, vector=embedding, payload=payload)]
+            points=[make_point(point_id, embedding.tolist(), payload)]
         )
         
-        global_state_store[point_id] = payload
+        global_state_store.add(point_id)
+        if global_qdrant_in_memory:
+            memory_index_add([point_id], embedding[np.newaxis, :])
+        semantic_cache_clear()
         
         return {"id": point_id, "message": "Document ingested successfully"}
     except Exception as e:
@@ -187,8 +483,8 @@ async def query_documents(query_input: QueryInput):
     
     try:
         # Run the LangGraph workflow
-        initial_state = create_initial_state(query_input.query)
-        final_state = global_workflow.invoke(initial_state)
+        initial_state = create_initial_state(query_input.query, query_input.metadata_filter)
+        final_state = await global_workflow.ainvoke(initial_state)
         
         processing_time = time.time() - start_time
         
@@ -203,31 +499,50 @@ async def query_documents(query_input: QueryInput):
 
 @global_app.get("/documents")
 async def list_documents(limit: int = 10):
+    limit = max(limit, 0)
+    page_size = max(1, min(limit, global_scroll_page_size))
     try:
-        # Scan collection
-        points = global_qdrant_client.scroll(
+        # Fetch the first page up front so connection errors still become a 500
+        page, next_offset = await global_qdrant_client.scroll(
             collection_name=global_collection_name,
-            limit=limit
+            limit=page_size
         )
-        documents = []
-        for point in points[0]:  # scroll returns tuple (points, next_offset)
-            documents.append({
-                "id": point.id,
-                "content": point.payload.get("content", "")[:100] + "...",
-                "metadata": point.payload.get("metadata", {})
-            })
-        return {"documents": documents}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Failed to list documents: {str(e)}")
 
+    async def generate():
+        nonlocal page, next_offset
+        remaining = limit
+        while True:
+            for point in page[:remaining]:
+                yield orjson.dumps({
+                    "id": point.id,
+                    "content": point.payload.get("content", "")[:100] + "...",
+                    "metadata": point.payload.get("metadata", {})
+                }) + b"\n"
+            remaining -= len(page)
+            if remaining <= 0 or next_offset is None:
+                break
+            page, next_offset = await global_qdrant_client.scroll(
+                collection_name=global_collection_name,
+                limit=min(remaining, page_size),
+                offset=next_offset
+            )
+
+    # One NDJSON line per document, written as scroll pages arrive
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
 @global_app.delete("/documents/{doc_id}")
 async def delete_document(doc_id: str):
     try:
-        global_qdrant_client.delete(
+        await global_qdrant_client.delete(
             collection_name=global_collection_name,
             points_selector=[doc_id]
         )
-        global_state_store.pop(doc_id, None)
+        global_state_store.discard(doc_id)
+        if global_qdrant_in_memory:
+            memory_index_remove(doc_id)
+        semantic_cache_clear()
         return {"message": f"Document {doc_id} deleted"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Deletion failed: {str(e)}")
@@ -236,7 +551,7 @@ async def delete_document(doc_id: str):
 async def health_check():
     qdrant_healthy = False
     try:
-        global_qdrant_client.get_collection(global_collection_name)
+        await global_qdrant_client.get_collection(global_collection_name)
         qdrant_healthy = True
     except:
         pass
@@ -251,7 +566,7 @@ async def health_check():
 @global_app.get("/debug/state")
 async def debug_state():
     return {
-        "global_state_store_keys": list(global_state_store.keys()),
+        "global_state_store_keys": list(global_state_store),
         "collection_name": global_collection_name,
         "embedding_dim": global_embedding_dim
     }
@@ -268,24 +583,51 @@ async def chaos_mode():
 @global_app.post("/batch_ingest")
 async def batch_ingest(documents: List[DocumentInput]):
     results = []
-    for doc in documents:
+    points = []
+    rows = []  # Row of `embeddings` for each entry in `points`
+    # One (N, dim) matrix and a single tolist() instead of converting per document,
+    # built in a worker thread so large batches don't stall the event loop
+    def embed():
+        matrix = generate_embeddings([doc.content for doc in documents])
+        return matrix, matrix.tolist()
+    embeddings, vectors = await anyio.to_thread.run_sync(embed)
+    for row, (doc, vector) in enumerate(zip(documents, vectors)):
         try:
-            embedding = generate_embedding(doc.content)
             point_id = str(uuid.uuid4())
             payload = {
                 "content": doc.content,
                 "metadata": doc.metadata or {},
                 "ingested_at": datetime.utcnow().isoformat()
             }
-            global_qdrant_client.upsert(
-                collection_name=global_collection_name,
-                points=[PointStruct(id=point_id, vector=embedding, payload=payload)]
-            )
-            global_state_store[point_id] = payload
+            points.append(make_point(point_id, vector, payload))
+            rows.append(row)
             results.append({"id": point_id, "status": "success"})
         except Exception as e:
             results.append({"status": "error", "error": str(e)})
-    
+
+    if points:
+        # One upsert for the whole batch instead of a round-trip per document
+        try:
+            await global_qdrant_client.upsert(
+                collection_name=global_collection_name,
+                points=points,
+                # Wait for the points to be applied: the semantic cache is cleared
+                # below, and clearing before they are searchable would let queries
+                # re-cache results that miss them
+                wait=True
+            )
+            for point in points:
+                global_state_store.add(point.id)
+            if global_qdrant_in_memory:
+                # Reuse the float32 matrix rather than rebuilding it from the Python lists
+                memory_index_add([point.id for point in points], embeddings[rows])
+            semantic_cache_clear()
+        except Exception as e:
+            for result in results:
+                if result["status"] == "success":
+                    result["status"] = "error"
+                    result["error"] = str(e)
+
     return {"results": results}
 
 messy_counter = 0